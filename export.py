@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Headless export of replays to PNG frame sequences or video.
+
+Replays are recorded by the game whenever a new best time is set
+(replays/level_<n>.json) and can also be written by hand or by a solver:
+
+    {"level": 1, "inputs": [2, 2, 6, 2, ...]}
+
+Each entry in "inputs" is one tick of INPUT_LEFT/INPUT_RIGHT/INPUT_JUMP bits.
+
+Usage:
+    python export.py replays/level_1.json -o frames/
+    python export.py replays/level_1.json -o run.mp4
+"""
+import os
+
+# Render without a window; must be set before pygame is imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import glob
+import json
+import shutil
+import struct
+import subprocess
+import sys
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pygame
+
+from main import Game, FPS, SCREEN_WIDTH, SCREEN_HEIGHT
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".webm", ".mov", ".avi")
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def load_replay(path):
+    with open(path, "r") as f:
+        replay = json.load(f)
+    return replay["level"], replay["inputs"]
+
+
+def render_frames(level, inputs):
+    """Simulate a replay tick by tick and yield each frame as raw RGB bytes.
+
+    The first frame shows the level before any input is applied.
+    """
+    game = Game()
+    game.current_level = level
+    game.show_main_menu = False
+    game.reset_level()
+
+    surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    def draw_frame():
+        # Show game time rather than wall time, which depends on export speed
+        game.current_time = game.ticks / FPS
+        game.draw_background(surface)
+        game.draw_game(surface)
+        return pygame.image.tobytes(surface, "RGB")
+
+    yield draw_frame()
+    for tick_inputs in inputs:
+        finished = game.update_game(tick_inputs)
+        yield draw_frame()
+
+        if finished:
+            break
+
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def write_png(path, frame, compression=1):
+    """Write a raw RGB frame as a PNG.
+
+    pygame.image.save always uses the default zlib level; level 1 encodes
+    these mostly flat frames several times faster at a similar size.
+    """
+    stride = SCREEN_WIDTH * 3
+    # Each scanline is prefixed with filter type 0 (none)
+    rows = b"".join(b"\x00" + frame[y * stride:(y + 1) * stride] for y in range(SCREEN_HEIGHT))
+    header = struct.pack(">IIBBBBB", SCREEN_WIDTH, SCREEN_HEIGHT, 8, 2, 0, 0, 0)  # 8-bit RGB
+    with open(path, "wb") as f:
+        f.write(PNG_SIGNATURE)
+        f.write(png_chunk(b"IHDR", header))
+        f.write(png_chunk(b"IDAT", zlib.compress(rows, compression)))
+        f.write(png_chunk(b"IEND", b""))
+
+
+def save_pngs(batch, compression):
+    for path, frame in batch:
+        write_png(path, frame, compression)
+
+
+def export_png(frames, out_dir, workers=None, max_pending=32, batch_size=8, compression=1):
+    """Encode frames to PNG files in worker processes.
+
+    Frames are sent to the workers in batches of batch_size. At most
+    max_pending frames are in flight; rendering waits on the oldest batch
+    when the queue is full so memory stays bounded.
+    """
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+
+    # Remove frames of an earlier export so the sequence only holds this one
+    for old_frame in glob.glob(os.path.join(out_dir, "frame_*.png")):
+        os.remove(old_frame)
+
+    count = 0
+    batch = []
+    pending = deque()
+    max_batches = max(1, max_pending // batch_size)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for index, frame in enumerate(frames):
+            batch.append((os.path.join(out_dir, f"frame_{index:05d}.png"), frame))
+            count += 1
+            if len(batch) < batch_size:
+                continue
+            if len(pending) >= max_batches:
+                pending.popleft().result()
+            pending.append(pool.submit(save_pngs, batch, compression))
+            batch = []
+
+        if batch:
+            pending.append(pool.submit(save_pngs, batch, compression))
+        while pending:
+            pending.popleft().result()
+    return count
+
+
+def export_video(frames, path, ffmpeg):
+    """Pipe raw frames to ffmpeg. The pipe buffer provides the backpressure."""
+    command = [
+        ffmpeg, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24",
+        "-s", f"{SCREEN_WIDTH}x{SCREEN_HEIGHT}", "-r", str(FPS),
+        "-i", "-",
+        "-pix_fmt", "yuv420p", path,
+    ]
+    encoder = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    count = 0
+    try:
+        for frame in frames:
+            encoder.stdin.write(frame)
+            count += 1
+    except BrokenPipeError:
+        # ffmpeg exited early; its return code is reported below
+        pass
+    finally:
+        try:
+            encoder.stdin.close()
+        except BrokenPipeError:
+            pass
+        encoder.wait()
+
+    if encoder.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with code {encoder.returncode}")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a replay to PNG frames or video without opening a window.")
+    parser.add_argument("replay", help="replay JSON file")
+    parser.add_argument("-o", "--output", required=True,
+                        help="output directory for PNG frames, or a video file (.mp4, .mkv, ...)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="PNG encoder processes (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=32,
+                        help="maximum frames waiting to be encoded")
+    parser.add_argument("--batch-size", type=int, default=8,
+                        help="frames sent to a PNG encoder process at a time")
+    parser.add_argument("--compression", type=int, default=1, choices=range(0, 10), metavar="0-9",
+                        help="PNG zlib compression level (default: 1, fastest)")
+    args = parser.parse_args()
+
+    level, inputs = load_replay(args.replay)
+    frames = render_frames(level, inputs)
+    output = args.output
+
+    start = time.perf_counter()
+    if output.lower().endswith(VIDEO_EXTENSIONS):
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg:
+            try:
+                count = export_video(frames, output, ffmpeg)
+            except RuntimeError as e:
+                print(e)
+                sys.exit(1)
+        else:
+            output = os.path.splitext(output)[0]
+            print(f"ffmpeg not found, writing PNG frames to {output}/ instead")
+            count = export_png(frames, output, args.workers, args.max_pending,
+                               args.batch_size, args.compression)
+    else:
+        count = export_png(frames, output, args.workers, args.max_pending,
+                           args.batch_size, args.compression)
+    elapsed = time.perf_counter() - start
+
+    print(f"Exported {count} frames to {output} in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.1f} fps)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 import os
 import time
 import json
+import struct
 import pygame
 import random
 import math
@@ -19,6 +20,14 @@ JUMP_STRENGTH = 15
 MAX_LEVEL = 3
 DOUBLE_JUMP_STRENGTH = 13  # Slightly lower strength for double jump
 
+# Input bits recorded once per tick in replays
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+
+# Length of the rewind history kept in practice
+REWIND_SECONDS = 10
+
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -252,6 +261,218 @@ class Coin(pygame.sprite.Sprite):
         self.rect.y = y
 
 
+class Label:
+    def __init__(self, centerx, y, text, text_font, color):
+        self.centerx = centerx
+        self.y = y
+        self.text = text
+        self.font = text_font
+        self.color = color
+        self.parent = None
+        self.render()
+    
+    def set_text(self, text):
+        if text != self.text:
+            self.text = text
+            self.render()
+            if self.parent:
+                self.parent.dirty = True
+    
+    def render(self):
+        self.image = self.font.render(self.text, True, self.color)
+        self.rect = self.image.get_rect(centerx=self.centerx, top=self.y)
+
+
+class Button:
+    def __init__(self, x, y, width, height, text, text_font, color, action, subtitle=None):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.text = text
+        self.font = text_font
+        self.color = color
+        self.action = action
+        self.subtitle = subtitle
+        self.hovered = False
+        self.parent = None
+        
+        # Area covered by the button and the subtitle below it
+        extent_height = height + (10 + text_font.get_height() if subtitle is not None else 0)
+        self.extent = pygame.Rect(x, y, width, extent_height)
+        
+        # Rendered by the panel when the button first becomes visible
+        self.image = None
+    
+    def set_subtitle(self, subtitle):
+        if subtitle != self.subtitle:
+            self.subtitle = subtitle
+            self.invalidate()
+    
+    def set_hovered(self, hovered):
+        if hovered != self.hovered:
+            self.hovered = hovered
+            self.invalidate()
+    
+    def invalidate(self):
+        self.image = None
+        if self.parent:
+            self.parent.dirty = True
+    
+    def render(self):
+        self.image = pygame.Surface(self.extent.size, pygame.SRCALPHA)
+        button_rect = pygame.Rect(0, 0, self.rect.width, self.rect.height)
+        pygame.draw.rect(self.image, self.color, button_rect)
+        pygame.draw.rect(self.image, YELLOW if self.hovered else WHITE, button_rect, 2)  # Border
+        
+        text = self.font.render(self.text, True, WHITE)
+        self.image.blit(text, (button_rect.centerx - text.get_width()//2,
+                               button_rect.centery - text.get_height()//2))
+        
+        if self.subtitle is not None:
+            subtitle_text = self.font.render(self.subtitle, True, YELLOW)
+            self.image.blit(subtitle_text, (button_rect.centerx - subtitle_text.get_width()//2,
+                                            button_rect.bottom + 10))
+
+
+class Panel:
+    # Height of the rows in the hit-test and visibility index
+    INDEX_CELL = 50
+    
+    def __init__(self, x, y, width, height, fill=None):
+        # Widgets are positioned in content coordinates, relative to the panel
+        # top left and offset by the scroll position
+        self.viewport = pygame.Rect(x, y, width, height)
+        self.fill = fill
+        self.labels = []
+        self.buttons = []
+        self.index = {}
+        self.content_height = 0
+        self.scroll = 0
+        self.hovered = None
+        self.rendered = set()
+        self.image = pygame.Surface(self.viewport.size, pygame.SRCALPHA)
+        self.dirty = True
+    
+    def add(self, widget):
+        widget.parent = self
+        if isinstance(widget, Button):
+            self.buttons.append(widget)
+            extent = widget.extent
+            for cell in range(extent.top // self.INDEX_CELL, (extent.bottom - 1) // self.INDEX_CELL + 1):
+                self.index.setdefault(cell, []).append(widget)
+        else:
+            self.labels.append(widget)
+            extent = widget.rect
+        self.content_height = max(self.content_height, extent.bottom)
+        self.dirty = True
+        return widget
+    
+    def buttons_between(self, top, bottom):
+        found = {}
+        for cell in range(top // self.INDEX_CELL, (bottom - 1) // self.INDEX_CELL + 1):
+            for button in self.index.get(cell, ()):
+                found[id(button)] = button
+        return found.values()
+    
+    def button_at(self, pos):
+        if not self.viewport.collidepoint(pos):
+            return None
+        x = pos[0] - self.viewport.x
+        y = pos[1] - self.viewport.y + self.scroll
+        for button in self.index.get(y // self.INDEX_CELL, ()):
+            if button.rect.collidepoint(x, y):
+                return button
+        return None
+    
+    def set_hover(self, pos):
+        button = self.button_at(pos)
+        if button is not self.hovered:
+            if self.hovered:
+                self.hovered.set_hovered(False)
+            if button:
+                button.set_hovered(True)
+            self.hovered = button
+    
+    def clear_hover(self):
+        if self.hovered:
+            self.hovered.set_hovered(False)
+            self.hovered = None
+    
+    def scroll_by(self, amount):
+        max_scroll = max(0, self.content_height - self.viewport.height)
+        scroll = min(max(self.scroll + amount, 0), max_scroll)
+        if scroll != self.scroll:
+            self.scroll = scroll
+            self.dirty = True
+    
+    def redraw(self):
+        self.image.fill(self.fill or (0, 0, 0, 0))
+        top = self.scroll
+        bottom = self.scroll + self.viewport.height
+        
+        for label in self.labels:
+            if label.rect.bottom > top and label.rect.top < bottom:
+                self.image.blit(label.image, (label.rect.x, label.rect.y - top))
+        
+        # Only visit the buttons in visible index rows
+        for button in self.buttons_between(top, bottom):
+            if button.image is None:
+                button.render()
+                self.rendered.add(button)
+            self.image.blit(button.image, (button.rect.x, button.rect.y - top))
+        
+        # Drop the images of buttons more than a screen away from the viewport
+        keep_top = top - self.viewport.height
+        keep_bottom = bottom + self.viewport.height
+        for button in list(self.rendered):
+            if button.extent.bottom <= keep_top or button.extent.top >= keep_bottom:
+                button.image = None
+                self.rendered.discard(button)
+        
+        self.dirty = False
+    
+    def draw(self, surface):
+        if self.dirty:
+            self.redraw()
+        surface.blit(self.image, self.viewport)
+
+
+# Savestate layout: level, player x/y, vel_x, vel_y, on_ground, is_jumping,
+# can_double_jump, facing_right, frame_index, animation_timer, trail_timer,
+# arrow offset/direction, coins collected, collected coin bits, ticks, time.
+# Levels are limited to 65535 and coins per level to MAX_COINS (one bit each).
+SAVESTATE = struct.Struct("<Hhhhf????BBBfbHQId")
+MAX_COINS = 64
+
+
+class StateRing:
+    def __init__(self, capacity):
+        # Fixed-size buffer of packed savestates, overwriting the oldest when full
+        self.capacity = capacity
+        self.buffer = bytearray(capacity * SAVESTATE.size)
+        self.head = 0
+        self.count = 0
+    
+    def clear(self):
+        self.head = 0
+        self.count = 0
+    
+    def push(self, game):
+        game.save_state(self.buffer, self.head * SAVESTATE.size)
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+    
+    def pop(self, game):
+        # Restore the most recent state, returns False when there is nothing to restore
+        if self.count == 0:
+            return False
+        self.head = (self.head - 1) % self.capacity
+        self.count -= 1
+        if not game.load_state(self.buffer, self.head * SAVESTATE.size):
+            self.clear()
+            return False
+        return True
+
+
 class Game:
     def __init__(self):
         # Create groups for sprites
@@ -269,6 +490,8 @@ class Game:
         self.current_level = 1
         self.collected_coins = 0
         self.total_coins = 0
+        self.coin_mask = 0
+        self.level_coins = []
         self.show_main_menu = True
         self.level_complete = False
         
@@ -276,7 +499,22 @@ class Game:
         self.running = False
         self.start_time = 0
         self.current_time = 0
+        self.ticks = 0
         self.best_times = self.load_best_times()
+        
+        # Inputs of the current attempt, one bitmask per tick
+        self.replay_inputs = []
+        
+        # Practice: a savestate slot and a rewind history. Attempts that use
+        # either don't count for best times.
+        self.practice = False
+        self.savestate = bytearray(SAVESTATE.size)
+        self.has_savestate = False
+        self.rewind_buffer = StateRing(REWIND_SECONDS * FPS)
+        
+        # Menus are built once and redrawn only when their contents change
+        self.build_main_menu()
+        self.level_complete_menu = None
     
     def reset_level(self):
         # Clear all sprites
@@ -293,6 +531,12 @@ class Game:
         # Reset coins collected
         self.collected_coins = 0
         self.total_coins = 0
+        self.coin_mask = 0
+        self.level_coins = []
+        
+        # Start a fresh recording
+        self.replay_inputs = []
+        self.practice = False
         
         # Create level
         self.create_level(self.current_level)
@@ -428,8 +672,11 @@ class Game:
             self.hazards.add(hazard)
         
         # Create coins
+        assert len(coins_pos) <= MAX_COINS, f"Level {level_num} has more than {MAX_COINS} coins"
         for x, y in coins_pos:
             coin = Coin(x, y)
+            coin.index = len(self.level_coins)  # Bit in coin_mask
+            self.level_coins.append(coin)
             self.all_sprites.add(coin)
             self.coins.add(coin)
             self.total_coins += 1
@@ -458,120 +705,268 @@ class Game:
         except Exception as e:
             print(f"Error saving best times: {e}")
     
+    def save_replay(self):
+        try:
+            if not os.path.exists("replays"):
+                os.makedirs("replays")
+            with open(f"replays/level_{self.current_level}.json", "w") as f:
+                json.dump({"level": self.current_level, "inputs": self.replay_inputs}, f)
+        except Exception as e:
+            print(f"Error saving replay: {e}")
+    
     def start_timer(self):
         self.running = True
         self.start_time = time.time()
+        self.ticks = 0
     
     def stop_timer(self):
         self.running = False
         self.current_time = time.time() - self.start_time
         level_key = f"level_{self.current_level}"
-        if self.current_time < self.best_times[level_key]:
+        if not self.practice and self.current_time < self.best_times[level_key]:
             self.best_times[level_key] = self.current_time
             self.save_best_times()
             return True
         return False
     
+    def save_state(self, buffer, offset=0):
+        player = self.player
+        SAVESTATE.pack_into(buffer, offset,
+                            self.current_level, player.rect.x, player.rect.y,
+                            player.vel_x, player.vel_y,
+                            player.on_ground, player.is_jumping, player.can_double_jump, player.facing_right,
+                            player.frame_index, player.animation_timer, player.trail_timer,
+                            self.finish.arrow_offset, self.finish.arrow_dir,
+                            self.collected_coins, self.coin_mask, self.ticks, self.current_time)
+    
+    def load_state(self, buffer, offset=0):
+        # Returns False if the state belongs to another level
+        (level, x, y, vel_x, vel_y,
+         on_ground, is_jumping, can_double_jump, facing_right,
+         frame_index, animation_timer, trail_timer,
+         arrow_offset, arrow_dir,
+         collected_coins, coin_mask, ticks, current_time) = SAVESTATE.unpack_from(buffer, offset)
+        if level != self.current_level:
+            return False
+        
+        player = self.player
+        player.rect.x = x
+        player.rect.y = y
+        player.vel_x = vel_x
+        player.vel_y = vel_y
+        player.on_ground = on_ground
+        player.is_jumping = is_jumping
+        player.can_double_jump = can_double_jump
+        player.frame_index = frame_index
+        player.animation_timer = animation_timer
+        player.trail_timer = trail_timer
+        player.trail = []
+        
+        # Rebuild the image from the animation state
+        player.facing_right = facing_right
+        player.image = player.frames[frame_index] if vel_x != 0 else player.frames[0]
+        if not facing_right:
+            player.image = pygame.transform.flip(player.image, True, False)
+        
+        self.finish.arrow_offset = arrow_offset
+        self.finish.arrow_dir = arrow_dir
+        
+        # Only touch the coin groups if the collected coins differ
+        if coin_mask != self.coin_mask:
+            for coin in self.level_coins:
+                if coin_mask & (1 << coin.index):
+                    coin.kill()
+                elif not coin.alive():
+                    self.all_sprites.add(coin)
+                    self.coins.add(coin)
+            self.coin_mask = coin_mask
+        self.collected_coins = collected_coins
+        
+        # Continue the timer from the saved time
+        self.ticks = ticks
+        self.current_time = current_time
+        self.start_time = time.time() - current_time
+        self.running = True
+        return True
+    
     def format_time(self, seconds):
         if seconds == float('inf'):
             return "N/A"
         return f"{seconds:.2f}s"
     
-    def draw_background(self):
+    def draw_background(self, surface=None):
+        if surface is None:
+            surface = screen
+        
         # Draw space background
-        screen.fill((10, 10, 40))  # Dark blue
+        surface.fill((10, 10, 40))  # Dark blue
         
         # Draw stars
         for star in stars:
             color = (star[3], star[3], star[3])  # White with varying brightness
-            pygame.draw.circle(screen, color, (star[0], star[1]), star[2])
+            pygame.draw.circle(surface, color, (star[0], star[1]), star[2])
     
-    def draw_main_menu(self):
-        self.draw_background()
+    def draw_game(self, surface):
+        # Draw game elements
+        self.all_sprites.draw(surface)
         
-        # Draw title
-        title = title_font.render("SPEEDRUN CHALLENGE", True, YELLOW)
-        screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 100))
+        # Draw player trail behind player
+        self.player.draw_trail(surface)
         
-        # Draw level buttons
-        for level in range(1, MAX_LEVEL + 1):
-            level_key = f"level_{level}"
-            button_rect = pygame.Rect(SCREEN_WIDTH//2 - 100, 200 + 60 * level, 200, 50)
-            pygame.draw.rect(screen, BLUE, button_rect)
-            pygame.draw.rect(screen, WHITE, button_rect, 2)  # Border
-            
-            level_text = font.render(f"Level {level}", True, WHITE)
-            screen.blit(level_text, (button_rect.centerx - level_text.get_width()//2, 
-                                     button_rect.centery - level_text.get_height()//2))
-            
-            # Show best time for level
-            time_text = font.render(f"Best: {self.format_time(self.best_times[level_key])}", True, YELLOW)
-            screen.blit(time_text, (button_rect.centerx - time_text.get_width()//2, 
-                                    button_rect.bottom + 10))
+        # Draw finish line arrow
+        self.finish.draw_arrow(surface)
         
-        # Draw instructions
-        instructions = font.render("Click a level to begin!", True, WHITE)
-        screen.blit(instructions, (SCREEN_WIDTH//2 - instructions.get_width()//2, 500))
+        self.draw_hud(surface)
+    
+    def draw_hud(self, surface):
+        # Timer
+        timer_text = font.render(f"Time: {self.format_time(self.current_time)}", True, WHITE)
+        surface.blit(timer_text, (10, 10))
         
-        # Calculate and display total best time (sum of all levels)
-        total_best_time = sum(self.best_times.get(f"level_{level}", float('inf')) for level in range(1, MAX_LEVEL + 1))
-        total_time_text = font.render(f"Total Best Time: {self.format_time(total_best_time)}", True, GREEN)
-        screen.blit(total_time_text, (SCREEN_WIDTH//2 - total_time_text.get_width()//2, 540))
+        # Best time
+        level_key = f"level_{self.current_level}"
+        best_time_text = font.render(f"Best: {self.format_time(self.best_times[level_key])}", True, YELLOW)
+        surface.blit(best_time_text, (10, 40))
+        
+        # Coins
+        coins_text = font.render(f"Coins: {self.collected_coins}/{self.total_coins}", True, YELLOW)
+        surface.blit(coins_text, (10, 70))
+        
+        # Level indicator
+        level_text = font.render(f"Level {self.current_level}", True, WHITE)
+        surface.blit(level_text, (SCREEN_WIDTH - level_text.get_width() - 10, 10))
+        
+        # Practice indicator
+        if self.practice:
+            practice_text = font.render("PRACTICE", True, ORANGE)
+            surface.blit(practice_text, (SCREEN_WIDTH - practice_text.get_width() - 10, 40))
     
-    def draw_level_complete(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))  # Semi-transparent black
-        screen.blit(overlay, (0, 0))
+    def draw_controls(self, surface):
+        # Key hints are only drawn in interactive play, not in exported replays
+        # Controls reminder
+        controls_text = font.render("Arrows: Move | Space: Jump (x2) | R: Reset | ESC: Menu", True, WHITE)
+        surface.blit(controls_text, (SCREEN_WIDTH//2 - controls_text.get_width()//2, SCREEN_HEIGHT - 30))
         
-        # Draw completion message
-        complete_text = title_font.render(f"LEVEL {self.current_level} COMPLETE!", True, YELLOW)
-        screen.blit(complete_text, (SCREEN_WIDTH//2 - complete_text.get_width()//2, 150))
+        # Practice controls reminder
+        practice_controls_text = font.render("S: Save | L: Load | Hold Bksp: Rewind", True, WHITE)
+        surface.blit(practice_controls_text, (SCREEN_WIDTH//2 - practice_controls_text.get_width()//2, 10))
+    
+    def build_main_menu(self):
+        # Title, instructions and total time
+        self.menu_header = Panel(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.menu_header.add(Label(SCREEN_WIDTH//2, 100, "SPEEDRUN CHALLENGE", title_font, YELLOW))
+        self.menu_header.add(Label(SCREEN_WIDTH//2, 500, "Click a level to begin!", font, WHITE))
+        self.total_time_label = self.menu_header.add(Label(SCREEN_WIDTH//2, 540, self.total_best_time_text(), font, GREEN))
         
-        # Show time
-        time_text = font.render(f"Time: {self.format_time(self.current_time)}", True, WHITE)
-        screen.blit(time_text, (SCREEN_WIDTH//2 - time_text.get_width()//2, 220))
+        # Level buttons in a scrolling list
+        self.level_menu = Panel(SCREEN_WIDTH//2 - 150, 170, 300, 320)
+        for level in range(1, MAX_LEVEL + 1):
+            self.level_menu.add(Button(50, 10 + 100 * (level - 1), 200, 50, f"Level {level}", font, BLUE, level,
+                                       subtitle=self.best_time_text(level)))
         
-        # Show coins collected
-        coins_text = font.render(f"Coins: {self.collected_coins}/{self.total_coins}", True, YELLOW)
-        screen.blit(coins_text, (SCREEN_WIDTH//2 - coins_text.get_width()//2, 260))
+        # Background and both panels composited into one opaque surface
+        self.menu_image = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+    
+    def best_time_text(self, level):
+        return f"Best: {self.format_time(self.best_times[f'level_{level}'])}"
+    
+    def total_best_time_text(self):
+        # Calculate total best time (sum of all levels)
+        total_best_time = sum(self.best_times.get(f"level_{level}", float('inf')) for level in range(1, MAX_LEVEL + 1))
+        return f"Total Best Time: {self.format_time(total_best_time)}"
+    
+    def update_menu_times(self, level):
+        # Only the given level's best time changed
+        self.level_menu.buttons[level - 1].set_subtitle(self.best_time_text(level))
+        self.total_time_label.set_text(self.total_best_time_text())
+    
+    def draw_main_menu(self):
+        # Rebuild the composite only when a panel changed, otherwise the
+        # menu is a single opaque blit
+        if self.menu_header.dirty or self.level_menu.dirty:
+            self.draw_background(self.menu_image)
+            self.menu_header.draw(self.menu_image)
+            self.level_menu.draw(self.menu_image)
+        screen.blit(self.menu_image, (0, 0))
+    
+    def build_level_complete_menu(self):
+        menu = Panel(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT, fill=(0, 0, 0, 180))  # Semi-transparent black
         
-        # Draw buttons
+        # Completion message, time and coins collected
+        menu.add(Label(SCREEN_WIDTH//2, 150, f"LEVEL {self.current_level} COMPLETE!", title_font, YELLOW))
+        menu.add(Label(SCREEN_WIDTH//2, 220, f"Time: {self.format_time(self.current_time)}", font, WHITE))
+        menu.add(Label(SCREEN_WIDTH//2, 260, f"Coins: {self.collected_coins}/{self.total_coins}", font, YELLOW))
+        
+        # Buttons
         if self.current_level < MAX_LEVEL:
-            next_rect = pygame.Rect(SCREEN_WIDTH//2 - 210, 350, 200, 50)
-            pygame.draw.rect(screen, GREEN, next_rect)
-            pygame.draw.rect(screen, WHITE, next_rect, 2)
-            next_text = font.render("Next Level", True, WHITE)
-            screen.blit(next_text, (next_rect.centerx - next_text.get_width()//2, 
-                                   next_rect.centery - next_text.get_height()//2))
-        
-        retry_rect = pygame.Rect(SCREEN_WIDTH//2 + 10, 350, 200, 50)
-        pygame.draw.rect(screen, BLUE, retry_rect)
-        pygame.draw.rect(screen, WHITE, retry_rect, 2)
-        retry_text = font.render("Retry Level", True, WHITE)
-        screen.blit(retry_text, (retry_rect.centerx - retry_text.get_width()//2, 
-                               retry_rect.centery - retry_text.get_height()//2))
-        
-        menu_rect = pygame.Rect(SCREEN_WIDTH//2 - 100, 420, 200, 50)
-        pygame.draw.rect(screen, GRAY, menu_rect)
-        pygame.draw.rect(screen, WHITE, menu_rect, 2)
-        menu_text = font.render("Main Menu", True, WHITE)
-        screen.blit(menu_text, (menu_rect.centerx - menu_text.get_width()//2, 
-                              menu_rect.centery - menu_text.get_height()//2))
-        
-        return (next_rect if self.current_level < MAX_LEVEL else None, retry_rect, menu_rect)
-    
-    def handle_level_complete_input(self, pos, next_rect, retry_rect, menu_rect):
-        if next_rect and next_rect.collidepoint(pos):
+            menu.add(Button(SCREEN_WIDTH//2 - 210, 350, 200, 50, "Next Level", font, GREEN, "next"))
+        menu.add(Button(SCREEN_WIDTH//2 + 10, 350, 200, 50, "Retry Level", font, BLUE, "retry"))
+        menu.add(Button(SCREEN_WIDTH//2 - 100, 420, 200, 50, "Main Menu", font, GRAY, "menu"))
+        
+        self.level_complete_menu = menu
+    
+    def draw_level_complete(self):
+        self.level_complete_menu.draw(screen)
+    
+    def handle_level_complete_input(self, pos):
+        button = self.level_complete_menu.button_at(pos)
+        if button is None:
+            return
+        if button.action == "next":
             self.current_level += 1
             self.level_complete = False
             self.reset_level()
-        elif retry_rect.collidepoint(pos):
+        elif button.action == "retry":
             self.level_complete = False
             self.reset_level()
-        elif menu_rect.collidepoint(pos):
+        elif button.action == "menu":
             self.show_main_menu = True
             self.level_complete = False
     
+    def update_game(self, inputs):
+        """Advance gameplay by one tick. Returns True if the finish was reached."""
+        self.replay_inputs.append(inputs)
+        
+        if inputs & INPUT_JUMP:
+            self.player.jump()
+        
+        self.player.vel_x = 0
+        if inputs & INPUT_LEFT:
+            self.player.vel_x = -PLAYER_SPEED
+        if inputs & INPUT_RIGHT:
+            self.player.vel_x = PLAYER_SPEED
+        
+        # Update player
+        self.player.update(self.platforms)
+        self.ticks += 1
+        
+        # Check for coin collection
+        coin_hits = pygame.sprite.spritecollide(self.player, self.coins, True)
+        for coin in coin_hits:
+            self.collected_coins += 1
+            self.coin_mask |= 1 << coin.index
+        
+        # Check for finish
+        if pygame.sprite.spritecollide(self.player, self.finish_group, False):
+            return True
+        
+        # Check for hazards
+        if pygame.sprite.spritecollide(self.player, self.hazards, False):
+            self.reset_level()
+        
+        # Check for falling off the screen
+        if self.player.rect.top > SCREEN_HEIGHT:
+            self.reset_level()
+        
+        # Update timer if the game is running
+        if self.running:
+            self.current_time = time.time() - self.start_time
+        
+        # Update finish line animation
+        self.finish.update()
+        
+        return False
+    
     def run(self):
         # Game variables
         game_active = False
@@ -579,6 +974,8 @@ class Game:
         # Main game loop
         running = True
         while running:
+            jump_pressed = False
+            
             # Event handling
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -597,7 +994,15 @@ class Game:
                     
                     if game_active and not self.level_complete:
                         if event.key == pygame.K_SPACE:
-                            self.player.jump()
+                            jump_pressed = True
+                        
+                        # Savestate
+                        if event.key == pygame.K_s:
+                            self.save_state(self.savestate)
+                            self.has_savestate = True
+                        if event.key == pygame.K_l and self.has_savestate:
+                            if self.load_state(self.savestate):
+                                self.practice = True
                 
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     if event.button == 1:  # Left mouse button
@@ -605,21 +1010,33 @@ class Game:
                         
                         # Handle main menu clicks
                         if self.show_main_menu:
-                            for level in range(1, MAX_LEVEL + 1):
-                                button_rect = pygame.Rect(SCREEN_WIDTH//2 - 100, 200 + 60 * level, 200, 50)
-                                if button_rect.collidepoint(pos):
-                                    self.current_level = level
-                                    self.show_main_menu = False
-                                    game_active = True
-                                    self.reset_level()
+                            button = self.level_menu.button_at(pos)
+                            if button:
+                                # Don't keep the highlight for when the menu is shown again
+                                self.level_menu.clear_hover()
+                                self.current_level = button.action
+                                self.show_main_menu = False
+                                game_active = True
+                                self.reset_level()
                         
                         # Handle level complete screen clicks
                         elif self.level_complete:
-                            next_rect, retry_rect, menu_rect = self.draw_level_complete()
-                            self.handle_level_complete_input(pos, next_rect, retry_rect, menu_rect)
+                            self.handle_level_complete_input(pos)
+                
+                if event.type == pygame.MOUSEMOTION:
+                    if self.show_main_menu:
+                        self.level_menu.set_hover(event.pos)
+                    elif self.level_complete:
+                        self.level_complete_menu.set_hover(event.pos)
+                
+                # Scroll the level list
+                if event.type == pygame.MOUSEWHEEL and self.show_main_menu:
+                    self.level_menu.scroll_by(-event.y * 40)
+                    self.level_menu.set_hover(pygame.mouse.get_pos())
             
-            # Draw background
-            self.draw_background()
+            # Draw background (the main menu has its own cached one)
+            if not self.show_main_menu:
+                self.draw_background()
             
             # Main menu
             if self.show_main_menu:
@@ -628,71 +1045,35 @@ class Game:
             elif game_active and not self.level_complete:
                 # Get the pressed keys
                 keys = pygame.key.get_pressed()
-                self.player.vel_x = 0
-                if keys[pygame.K_LEFT]:
-                    self.player.vel_x = -PLAYER_SPEED
-                if keys[pygame.K_RIGHT]:
-                    self.player.vel_x = PLAYER_SPEED
-                
-                # Update player
-                self.player.update(self.platforms)
-                
-                # Check for coin collection
-                coin_hits = pygame.sprite.spritecollide(self.player, self.coins, True)
-                for coin in coin_hits:
-                    self.collected_coins += 1
                 
-                # Check for finish
-                if pygame.sprite.spritecollide(self.player, self.finish_group, False):
-                    game_active = True
-                    self.level_complete = True
-                    new_record = self.stop_timer()
-                
-                # Check for hazards
-                if pygame.sprite.spritecollide(self.player, self.hazards, False):
-                    self.reset_level()
-                
-                # Check for falling off the screen
-                if self.player.rect.top > SCREEN_HEIGHT:
-                    self.reset_level()
-                
-                # Update timer if the game is running
-                if self.running:
-                    self.current_time = time.time() - self.start_time
-                
-                # Update finish line animation
-                self.finish.update()
-                
-                # Draw game elements
-                self.all_sprites.draw(screen)
-                
-                # Draw player trail behind player
-                self.player.draw_trail(screen)
-                
-                # Draw finish line arrow
-                self.finish.draw_arrow(screen)
-                
-                # Draw UI
-                # Timer
-                timer_text = font.render(f"Time: {self.format_time(self.current_time)}", True, WHITE)
-                screen.blit(timer_text, (10, 10))
-                
-                # Best time
-                level_key = f"level_{self.current_level}"
-                best_time_text = font.render(f"Best: {self.format_time(self.best_times[level_key])}", True, YELLOW)
-                screen.blit(best_time_text, (10, 40))
-                
-                # Coins
-                coins_text = font.render(f"Coins: {self.collected_coins}/{self.total_coins}", True, YELLOW)
-                screen.blit(coins_text, (10, 70))
-                
-                # Level indicator
-                level_text = font.render(f"Level {self.current_level}", True, WHITE)
-                screen.blit(level_text, (SCREEN_WIDTH - level_text.get_width() - 10, 10))
+                # Rewind one tick per frame while backspace is held
+                if keys[pygame.K_BACKSPACE]:
+                    if self.rewind_buffer.pop(self):
+                        self.practice = True
+                else:
+                    inputs = 0
+                    if keys[pygame.K_LEFT]:
+                        inputs |= INPUT_LEFT
+                    if keys[pygame.K_RIGHT]:
+                        inputs |= INPUT_RIGHT
+                    if jump_pressed:
+                        inputs |= INPUT_JUMP
+                    
+                    # Remember the state before this tick for rewinding
+                    self.rewind_buffer.push(self)
+                    
+                    # Update the game and check for finish
+                    if self.update_game(inputs):
+                        game_active = True
+                        self.level_complete = True
+                        new_record = self.stop_timer()
+                        if new_record:
+                            self.save_replay()
+                            self.update_menu_times(self.current_level)
+                        self.build_level_complete_menu()
                 
-                # Controls reminder
-                controls_text = font.render("Arrows: Move | Space: Jump (x2) | R: Reset | ESC: Menu", True, WHITE)
-                screen.blit(controls_text, (SCREEN_WIDTH//2 - controls_text.get_width()//2, SCREEN_HEIGHT - 30))
+                self.draw_game(screen)
+                self.draw_controls(screen)
             
             # Level complete screen
             elif self.level_complete: